@@ -2,20 +2,45 @@
 import os
 import re
 import cmd
+import csv
+import array
 import sys
+import glob
+import json
+import math
 import time
+import random
+import signal
+import socket
 import rich
 import click
 import logging
 import sqlite3
 import getpass
+import hashlib
 import datetime
+import threading
+import statistics
+import contextlib
+import importlib.util
+import socketserver
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
 import typing as t
 from pathlib import Path
 from colorama import Fore
-from functools import wraps
+from functools import wraps, lru_cache
+from manager_client import (
+    FramedJSON,
+    unix_sockets,
+    server_socket_env_var,
+    default_server_socket,
+)
 
 # Rich
+from rich.live import Live
 from rich.table import Table
 from rich.console import Console
 from rich.markdown import Markdown
@@ -36,10 +61,38 @@ __repo__ = "https://github.com/Simatwa/sqlite3-cli-manager.git"
 get_arg = lambda e: e.args[1] if e.args and len(e.args) > 1 else str(e)
 """An ugly anonymous function to extract exception message"""
 
+
+def unique_names(names: t.Iterable[str]) -> t.List[str]:
+    """Suffix repeated column names with _1, _2... so that none is lost when
+    rows are keyed by name"""
+    seen = set()
+    unique = []
+    for name in names:
+        candidate, suffix = name, 0
+        while candidate in seen:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
 table_column_headers = ("cid", "name", "type", "notnull", "default", "pk")
 
 table_headers = ("_", "name", "type", "_", "_", "_")
 
+blob_chunk_size = 64 * 1024
+"""Bytes read from or written to a blob at a time"""
+
+progress_handler_interval = 1000
+"""Virtual machine steps between statement budget checks"""
+
+column_chunk_size = 10_000
+"""Rows fetched at a time into columnar buffers"""
+
+server_idle_timeout = 5.0
+"""Seconds a server waits on a client before dropping it for the next one"""
+
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s : %(message)s",
     datefmt="%d-%b-%Y %H:%M:%S",
@@ -60,35 +113,475 @@ def cli_error_handler(func):
     return decorator
 
 
+class QueryInterrupted(Exception):
+    """Statement aborted for exceeding its budget or being cancelled"""
+
+
+class FunctionRegistry:
+    """Python functions made available to sql statements.
+
+    Plugins are python modules, dotted names or file paths, defining
+    `register(registry: FunctionRegistry)` that adds their functions e.g
+
+    ```python
+    def register(registry):
+        @registry.scalar("reverse", deterministic=True)
+        def reverse(text):
+            return text[::-1] if text is not None else None
+    ```
+    """
+
+    def __init__(self, builtins: bool = True):
+        """Initializes `FunctionRegistry`
+
+        Args:
+            builtins (bool, optional): Include regexp, json and hashing helpers. Defaults to True.
+        """
+        self.functions: t.Dict[t.Tuple[str, int], t.Tuple[str, t.Callable, bool]] = {}
+        if builtins:
+            self.register_builtins()
+
+    def add(
+        self,
+        kind: str,
+        function: t.Callable,
+        name: str = None,
+        nargs: int = -1,
+        deterministic: bool = False,
+    ):
+        """Add scalar function, aggregate or window function class
+
+        Args:
+            kind (str): One of scalar, aggregate or window.
+            function (t.Callable): Function or class implementing it.
+            name (str, optional): Name used in sql statements. Defaults to `function.__name__`.
+            nargs (int, optional): Number of arguments, -1 for any. Defaults to -1.
+            deterministic (bool, optional): Same arguments always give the same result,
+                letting sqlite use it in indexes and fold constants. Scalars only. Defaults to False.
+        """
+        assert kind in (
+            "scalar",
+            "aggregate",
+            "window",
+        ), f"Function kind must be one of scalar, aggregate or window not {kind!r}"
+        self.functions[((name or function.__name__).lower(), nargs)] = (
+            kind,
+            function,
+            deterministic,
+        )
+
+    def scalar(self, name: str = None, nargs: int = -1, deterministic: bool = False):
+        """Decorator for adding scalar function. See `add` for args"""
+
+        def decorator(function: t.Callable) -> t.Callable:
+            self.add("scalar", function, name, nargs, deterministic)
+            return function
+
+        return decorator
+
+    def aggregate(self, name: str = None, nargs: int = -1):
+        """Decorator for adding aggregate class with `step` and `finalize` methods"""
+
+        def decorator(aggregate_class: type) -> type:
+            self.add("aggregate", aggregate_class, name, nargs)
+            return aggregate_class
+
+        return decorator
+
+    def window(self, name: str = None, nargs: int = -1):
+        """Decorator for adding window function class with `step`, `inverse`,
+        `value` and `finalize` methods"""
+
+        def decorator(window_class: type) -> type:
+            self.add("window", window_class, name, nargs)
+            return window_class
+
+        return decorator
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def import_plugin(plugin: str) -> object:
+        """Import plugin module from dotted name or file path"""
+        if plugin.endswith(".py") or os.path.isfile(plugin):
+            spec = importlib.util.spec_from_file_location(Path(plugin).stem, plugin)
+            if spec is None:
+                raise ImportError(f"Cannot load plugin from {plugin!r}")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+        return importlib.import_module(plugin)
+
+    def load_plugin(self, plugin: str):
+        """Add functions of plugin module"""
+        module = self.import_plugin(plugin)
+        if not callable(getattr(module, "register", None)):
+            raise Exception(f"Plugin {plugin!r} does not define register(registry)")
+        module.register(self)
+
+    def install(self, connection: sqlite3.Connection):
+        """Create the functions on `connection`"""
+        for (name, nargs), (kind, function, deterministic) in self.functions.items():
+            if kind == "scalar":
+                connection.create_function(
+                    name, nargs, function, deterministic=deterministic
+                )
+            elif kind == "aggregate":
+                connection.create_aggregate(name, nargs, function)
+            else:
+                connection.create_window_function(name, nargs, function)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def compile_pattern(pattern: str) -> re.Pattern:
+        return re.compile(pattern)
+
+    def register_builtins(self):
+        """Add regexp, json and hashing helpers"""
+
+        @self.scalar("regexp", 2, deterministic=True)
+        def regexp(pattern: str, value: t.Any) -> t.Union[bool, None]:
+            # `x REGEXP y` is evaluated as regexp(y, x)
+            if pattern is None or value is None:
+                return None
+            return self.compile_pattern(pattern).search(str(value)) is not None
+
+        @self.scalar("json_canonical", 1, deterministic=True)
+        def json_canonical(text: str) -> t.Union[str, None]:
+            if text is None:
+                return None
+            return json.dumps(json.loads(text), sort_keys=True, separators=(",", ":"))
+
+        def hasher(algorithm: str) -> t.Callable:
+            def digest(value: t.Any) -> t.Union[str, None]:
+                if value is None:
+                    return None
+                if not isinstance(value, bytes):
+                    value = str(value).encode()
+                return hashlib.new(algorithm, value).hexdigest()
+
+            return digest
+
+        for algorithm in ("md5", "sha1", "sha256"):
+            self.add("scalar", hasher(algorithm), algorithm, 1, deterministic=True)
+
+
+class ColumnBuffer:
+    """Growable buffer of a result column's values. Values are packed into
+    `array.array` while they're all integers or all floats without nulls and
+    kept in a list otherwise"""
+
+    typecodes = {int: "q", float: "d"}
+
+    def __init__(self, kind: type = None):
+        """Initializes `ColumnBuffer`
+
+        Args:
+            kind (type, optional): Expected type of values, int or float, usually
+                from the declared column type. Only a hint, values that don't fit
+                it exactly are kept in a list. Inferred from values when None. Defaults to None.
+        """
+        typecode = self.typecodes.get(kind)
+        self.values: t.Union[array.array, list, None] = (
+            array.array(typecode) if typecode else None
+        )
+
+    def extend(self, values: t.Sequence[t.Any]):
+        if self.values is None:
+            if isinstance(values, array.array):
+                typecode = values.typecode
+            else:
+                first = next((value for value in values if value is not None), None)
+                typecode = self.typecodes.get(type(first))
+            self.values = array.array(typecode) if typecode else []
+        if isinstance(self.values, array.array):
+            # Float arrays take integers too, silently rounding those beyond 2**53
+            if self.values.typecode == "d" and any(
+                type(value) is int and float(value) != value for value in values
+            ):
+                self.values = self.values.tolist()
+            else:
+                try:
+                    self.values.extend(array.array(self.values.typecode, values))
+                    return
+                except (TypeError, OverflowError):
+                    self.values = self.values.tolist()
+        self.values.extend(values)
+
+    def result(self, numpy: t.Any = None) -> t.Any:
+        """Buffered values as numpy array when `numpy` module is given"""
+        values = self.values if self.values is not None else []
+        if numpy is None:
+            return values
+        elif isinstance(values, array.array):
+            return numpy.frombuffer(
+                values, dtype=numpy.int64 if values.typecode == "q" else numpy.float64
+            )
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+    @staticmethod
+    def kind(declared_type: str) -> t.Union[type, None]:
+        """Python type of values stored in column of `declared_type` as per sqlite affinity rules"""
+        declared_type = (declared_type or "").upper()
+        if "INT" in declared_type:
+            return int
+        elif any(real in declared_type for real in ("REAL", "FLOA", "DOUB")):
+            return float
+        return None
+
+    @staticmethod
+    def import_numpy(use_numpy: bool = None) -> t.Any:
+        """numpy module if it's to be used and is installed"""
+        if use_numpy is False:
+            return None
+        try:
+            import numpy
+        except ImportError:
+            if use_numpy:
+                raise Exception(
+                    "Looks like numpy isn't installed. Install it before requesting "
+                    'numpy arrays - "pip install numpy"'
+                )
+            return None
+        return numpy
+
+
 class Sqlite3Manager:
     """Perform CRUD operations on db"""
 
-    def __init__(self, db_path: t.Union[str, Path], auto_commit: bool = False):
+    def __init__(
+        self,
+        db_path: t.Union[str, Path],
+        auto_commit: bool = False,
+        plugins: t.Sequence[str] = (),
+        timeout: float = None,
+        max_steps: int = None,
+        max_rows: int = None,
+    ):
         """Initializes `Sqlite3Manager`
 
         Args:
             db_path (t.Union[str, Path]): Path leading to sqlite3 database.
             auto_commit(optional, bool): Commit automatically. Defaults to False.
+            plugins(optional, t.Sequence[str]): Modules adding sql functions. See `FunctionRegistry`.
+            timeout(optional, float): Seconds a statement may run for. Defaults to None (unlimited).
+            max_steps(optional, int): Virtual machine steps a statement may take. Defaults to None (unlimited).
+            max_rows(optional, int): Rows to fetch per statement. Defaults to None (all).
         """
         self.db_path = db_path
         self.auto_commit = auto_commit
+        self.plugins = tuple(plugins)
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.max_rows = max_rows
+        self.last_description = None
         self.db_connection = sqlite3.connect(db_path, autocommit=auto_commit)
+        self.functions = FunctionRegistry()
+        for plugin in self.plugins:
+            self.functions.load_plugin(plugin)
+        self.functions.install(self.db_connection)
 
     def execute_sql_command(
-        self, statement: str, commit: bool = False
+        self,
+        statement: str,
+        commit: bool = False,
+        parameters: t.Sequence = (),
+        timeout: float = None,
+        max_steps: int = None,
+        max_rows: int = None,
     ) -> t.Tuple[t.Any]:
-        """Run sql statements against database"""
+        """Run sql statements against database.
+        `timeout`, `max_steps` and `max_rows` override session limits, 0 lifting them"""
+        timeout = self.timeout if timeout is None else timeout
+        max_steps = self.max_steps if max_steps is None else max_steps
+        max_rows = self.max_rows if max_rows is None else max_rows
+        cursor = None
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute(statement)
-            if commit:
-                self.commit()
-            resp = (True, cursor.fetchall())
+            with self.query_guard(timeout, max_steps):
+                cursor = self.db_connection.cursor()
+                cursor.execute(statement, parameters)
+                if commit:
+                    self.commit()
+                self.last_description = cursor.description
+                resp = (True, self.fetch_rows(cursor, max_rows))
         except Exception as e:
             resp = (False, e)
+        finally:
+            if cursor:
+                cursor.close()
+        return resp
+
+    @contextlib.contextmanager
+    def query_guard(
+        self,
+        timeout: float = None,
+        max_steps: int = None,
+        usage: t.Dict[str, float] = None,
+    ):
+        """Abort statements run within exceeding `timeout` seconds or `max_steps`
+        virtual machine steps, or when cancelled with Ctrl-C, raising `QueryInterrupted`.
+        The connection remains usable afterwards. `usage` accumulates seconds and
+        steps spent across guards sharing it, as the fetches of a streamed query."""
+        usage = {"time": 0.0, "steps": 0} if usage is None else usage
+        reason = None
+        started = time.monotonic()
+        deadline = started + timeout - usage["time"] if timeout else None
+        steps = usage["steps"]
+
+        def progress_handler() -> int:
+            nonlocal reason, steps
+            steps += progress_handler_interval
+            if reason:
+                pass
+            elif deadline and time.monotonic() > deadline:
+                reason = f"Statement exceeded time limit of {timeout}s"
+            elif max_steps and steps > max_steps:
+                reason = f"Statement exceeded limit of {max_steps} steps"
+            return 1 if reason else 0
+
+        def cancel(signum, frame):
+            nonlocal reason
+            reason = "Statement cancelled"
+            self.db_connection.interrupt()
+
+        # Signal handlers can only be set from the main thread. Python-level
+        # progress handler gives them the chance to run mid-statement.
+        handle_signal = threading.current_thread() is threading.main_thread()
+        if handle_signal:
+            previous_handler = signal.signal(signal.SIGINT, cancel)
+        self.db_connection.set_progress_handler(
+            progress_handler, progress_handler_interval
+        )
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if reason:
+                raise QueryInterrupted(reason) from e
+            raise
+        finally:
+            self.db_connection.set_progress_handler(None, 0)
+            if handle_signal:
+                signal.signal(signal.SIGINT, previous_handler)
+            usage["time"] += time.monotonic() - started
+            usage["steps"] = steps
+
+    @staticmethod
+    def fetch_rows(cursor: sqlite3.Cursor, max_rows: int = None) -> t.List[t.Tuple]:
+        """Fetch all rows or stop after `max_rows`"""
+        if not max_rows:
+            return cursor.fetchall()
+        rows = cursor.fetchmany(max_rows)
+        if len(rows) == max_rows and cursor.fetchone() is not None:
+            logging.warning(f"Results truncated to {max_rows} rows.")
+        return rows
+
+    def declared_types(self, statement: str) -> t.Dict[str, str]:
+        """Declared types of columns of the table a select statement queries"""
+        table_name = re.findall(r"\bfrom\s+([\w_]+)", statement, re.IGNORECASE)
+        if not table_name:
+            return {}
+        success, entries = self.table_columns(table_name[0])
+        return {entry[1]: entry[2] for entry in entries} if success else {}
+
+    def iter_rows(
+        self,
+        statement: str,
+        parameters: t.Sequence = (),
+        chunk_size: int = column_chunk_size,
+        timeout: float = None,
+        max_steps: int = None,
+    ) -> t.Iterator[t.List[t.Tuple[t.Any]]]:
+        """Stream query results as lists of up to `chunk_size` rows. Column names,
+        repeated ones included, are in `last_description` once the query runs.
+        See `iter_columns` for args."""
+        timeout = self.timeout if timeout is None else timeout
+        max_steps = self.max_steps if max_steps is None else max_steps
+        # Guarded call by call rather than across yields, so that the consumer
+        # keeps Ctrl-C and the connection while handling a chunk, and its time
+        # doesn't count against `timeout`
+        usage = {"time": 0.0, "steps": 0}
+        cursor = self.db_connection.cursor()
+        try:
+            with self.query_guard(timeout, max_steps, usage):
+                cursor.execute(statement, parameters)
+            self.last_description = cursor.description
+            while True:
+                with self.query_guard(timeout, max_steps, usage):
+                    rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
         finally:
             cursor.close()
-            return resp
+
+    def iter_columns(
+        self,
+        statement: str,
+        parameters: t.Sequence = (),
+        chunk_size: int = column_chunk_size,
+        use_numpy: bool = None,
+        timeout: float = None,
+        max_steps: int = None,
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Stream query results as chunks of columns, keeping memory bounded
+
+        Args:
+            statement (str): Sql query.
+            parameters (t.Sequence, optional): Values bound to query placeholders. Defaults to ().
+            chunk_size (int, optional): Rows per chunk. Defaults to 10,000.
+            use_numpy (bool, optional): Return numpy arrays. Defaults to None (if installed).
+            timeout, max_steps (optional): Statement limits. See `Sqlite3Manager`.
+
+        Yields:
+            t.Dict[str, t.Any]: Column name mapped to numpy array, `array.array` or list.
+                Repeated names, as in joins, are suffixed with _1, _2...
+        """
+        numpy = ColumnBuffer.import_numpy(use_numpy)
+        declared_types = self.declared_types(statement)
+        keys = kinds = None
+        for rows in self.iter_rows(
+            statement, parameters, chunk_size, timeout, max_steps
+        ):
+            if keys is None:
+                names = [column[0] for column in self.last_description]
+                keys = unique_names(names)
+                kinds = [ColumnBuffer.kind(declared_types.get(name)) for name in names]
+            chunk = {}
+            for key, kind, values in zip(keys, kinds, zip(*rows)):
+                buffer = ColumnBuffer(kind)
+                buffer.extend(values)
+                chunk[key] = buffer.result(numpy)
+            yield chunk
+
+    def fetch_columns(
+        self,
+        statement: str,
+        parameters: t.Sequence = (),
+        chunk_size: int = column_chunk_size,
+        use_numpy: bool = None,
+        timeout: float = None,
+        max_steps: int = None,
+    ) -> t.Dict[str, t.Any]:
+        """Query results as columns, each a numpy array when numpy is installed
+        or else `array.array` for integers and floats and list for the rest.
+        Columns with nulls or mixed types are kept as lists or object arrays.
+        See `iter_columns` for args."""
+        numpy = ColumnBuffer.import_numpy(use_numpy)
+        buffers: t.Dict[str, ColumnBuffer] = {}
+        for chunk in self.iter_columns(
+            statement, parameters, chunk_size, False, timeout, max_steps
+        ):
+            for name, values in chunk.items():
+                buffers.setdefault(name, ColumnBuffer()).extend(values)
+        if not buffers:
+            buffers = {
+                key: ColumnBuffer()
+                for key in unique_names(
+                    column[0] for column in self.last_description or ()
+                )
+            }
+        return {name: buffer.result(numpy) for name, buffer in buffers.items()}
 
     def tables(self, tbl_names_only: bool = False):
         """List tables available"""
@@ -111,6 +604,110 @@ class Sqlite3Manager:
         """Sqlite schema contents"""
         return self.execute_sql_command("SELECT * FROM sqlite_schema;")
 
+    @staticmethod
+    def quote_identifier(name: str) -> str:
+        """Quote table or column name for use in sql statement"""
+        return '"' + name.replace('"', '""') + '"'
+
+    def read_blob(
+        self,
+        table: str,
+        column: str,
+        rowid: int,
+        destination: t.BinaryIO,
+        chunk_size: int = blob_chunk_size,
+    ) -> int:
+        """Stream blob into `destination` without loading it whole into memory
+
+        Args:
+            table (str): Table containing the blob.
+            column (str): Blob column.
+            rowid (int): Rowid of the row containing the blob.
+            destination (t.BinaryIO): File-like object to write blob content to.
+            chunk_size (int, optional): Bytes to read at a time. Defaults to 64KiB.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        written = 0
+        with self.db_connection.blobopen(table, column, rowid, readonly=True) as blob:
+            while chunk := blob.read(chunk_size):
+                destination.write(chunk)
+                written += len(chunk)
+        return written
+
+    def write_blob(
+        self,
+        table: str,
+        column: str,
+        rowid: int,
+        source: t.BinaryIO,
+        size: int,
+        chunk_size: int = blob_chunk_size,
+    ) -> int:
+        """Stream `size` bytes from `source` into blob, replacing its content
+
+        Args:
+            table (str): Table containing the blob.
+            column (str): Blob column.
+            rowid (int): Rowid of the row to update.
+            source (t.BinaryIO): File-like object to read blob content from.
+            size (int): Number of bytes to be written.
+            chunk_size (int, optional): Bytes to write at a time. Defaults to 64KiB.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        with self.transaction() as cursor:
+            # Blobs can't be resized through blobopen, so reserve space first
+            cursor.execute(
+                f"UPDATE {self.quote_identifier(table)} "
+                f"SET {self.quote_identifier(column)} = zeroblob(?) WHERE rowid = ?",
+                (size, rowid),
+            )
+            if not cursor.rowcount:
+                raise Exception(f"No row with rowid {rowid} in table {table!r}")
+            written = 0
+            with self.db_connection.blobopen(table, column, rowid) as blob:
+                while written < size and (
+                    chunk := source.read(min(chunk_size, size - written))
+                ):
+                    blob.write(chunk)
+                    written += len(chunk)
+            if written != size:
+                raise Exception(f"Expected {size} bytes but source had {written}")
+        return written
+
+    @contextlib.contextmanager
+    def transaction(self) -> t.Iterator[sqlite3.Cursor]:
+        """Cursor whose statements are committed together or rolled back on error,
+        regardless of auto-commit"""
+        cursor = self.db_connection.cursor()
+        if self.auto_commit:
+            cursor.execute("BEGIN")
+        try:
+            yield cursor
+        except BaseException:
+            if self.auto_commit:
+                cursor.execute("ROLLBACK")
+            else:
+                self.db_connection.rollback()
+            raise
+        else:
+            if self.auto_commit:
+                cursor.execute("COMMIT")
+            else:
+                self.db_connection.commit()
+        finally:
+            cursor.close()
+
+    def data_version(self) -> int:
+        """Counter that changes whenever another connection commits to the database"""
+        success, data = self.execute_sql_command("PRAGMA data_version;")
+        if not success:
+            raise data
+        return data[0][0]
+
     def commit(self):
         """Commit changes"""
         if self.db_connection and not self.auto_commit:
@@ -128,6 +725,767 @@ class Sqlite3Manager:
             self.db_connection.close()
 
 
+# socketserver lacks UnixStreamServer where the platform, as Windows, has no
+# unix domain sockets. Commands then always open databases directly.
+if unix_sockets:
+
+    class QueryRequestHandler(socketserver.BaseRequestHandler):
+        """Serves framed requests from a single client until it disconnects
+        or stays idle for longer than the server's `idle_timeout`"""
+
+        def handle(self):
+            # Clients are served one at a time, so a stalled one mustn't keep
+            # the rest waiting
+            self.request.settimeout(self.server.idle_timeout)
+            try:
+                while True:
+                    try:
+                        request = FramedJSON.receive(self.request)
+                    except ValueError as e:
+                        # Whole frame was consumed so the stream is still in step
+                        response = {
+                            "success": False,
+                            "data": f"Malformed request - {e}",
+                        }
+                        FramedJSON.send(self.request, response)
+                        continue
+                    if request is None:
+                        break
+                    FramedJSON.send(self.request, self.server.dispatch(request))
+            except OSError as e:
+                logging.debug(f"Dropped client - {get_arg(e)}")
+
+    class QueryServer(socketserver.UnixStreamServer):
+        """Keeps a warm `Sqlite3Manager` behind a unix domain socket"""
+
+        def __init__(
+            self,
+            socket_path: t.Union[str, Path],
+            db_manager: Sqlite3Manager,
+            idle_timeout: float = server_idle_timeout,
+        ):
+            """Initializes `QueryServer`
+
+            Args:
+                socket_path (t.Union[str, Path]): Path to bind the unix socket to.
+                db_manager (Sqlite3Manager): Manager whose connection will be shared.
+                idle_timeout (float, optional): Seconds to wait on a client's next
+                    request before closing its connection. Defaults to 5.
+            """
+            self.socket_path = str(socket_path)
+            self.db_manager = db_manager
+            self.idle_timeout = idle_timeout
+            if os.path.exists(self.socket_path):
+                try:
+                    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                        probe.connect(self.socket_path)
+                except ConnectionRefusedError:
+                    # Left behind by a server that never cleaned up
+                    os.remove(self.socket_path)
+                else:
+                    raise Exception(
+                        f"A server is already listening on {self.socket_path}"
+                    )
+            super().__init__(self.socket_path, QueryRequestHandler)
+
+        def dispatch(self, request: dict) -> dict:
+            """Run client request against the warm connection"""
+            if not isinstance(request, dict):
+                return {"success": False, "data": "Request must be a json object"}
+            action = request.get("action")
+            if action == "ping":
+                return {
+                    "success": True,
+                    "data": str(self.db_manager.db_path),
+                    "idle_timeout": self.idle_timeout,
+                }
+            elif action == "execute":
+                if not isinstance(request.get("statement"), str):
+                    return {
+                        "success": False,
+                        "data": "Execute request lacks a statement",
+                    }
+                success, data = self.db_manager.execute_sql_command(
+                    request["statement"],
+                    commit=request.get("commit", False),
+                    parameters=request.get("parameters", ()),
+                    timeout=request.get("timeout"),
+                    max_steps=request.get("max_steps"),
+                    max_rows=request.get("max_rows"),
+                )
+                if not success:
+                    return {"success": False, "data": get_arg(data)}
+                return {
+                    "success": True,
+                    "data": data,
+                    "headers": [
+                        column[0] for column in self.db_manager.last_description or ()
+                    ],
+                }
+            elif action == "commit":
+                try:
+                    self.db_manager.commit()
+                except Exception as e:
+                    return {"success": False, "data": get_arg(e)}
+                return {"success": True, "data": None}
+            return {"success": False, "data": f"Unknown action {action!r}"}
+
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    class QueryClient:
+        """Forwards statements to a `QueryServer`. Only statement-level operations
+        of `Sqlite3Manager` are available, blobs and columnar fetches needing a
+        connection of their own."""
+
+        def __init__(
+            self,
+            socket_path: t.Union[str, Path],
+            db_path: t.Union[str, Path] = None,
+            timeout: float = None,
+            max_steps: int = None,
+            max_rows: int = None,
+        ):
+            """Initializes `QueryClient`
+
+            Args:
+                socket_path (t.Union[str, Path]): Unix socket the server listens on.
+                db_path (t.Union[str, Path], optional): Database the server is expected
+                    to be serving. Raises `ConnectionError` on mismatch. Defaults to None.
+                timeout, max_steps, max_rows (optional): Statement limits. See `Sqlite3Manager`.
+            """
+            self.socket_path = str(socket_path)
+            self.timeout = timeout
+            self.max_steps = max_steps
+            self.max_rows = max_rows
+            self.last_description = None
+            self.connection = None
+            self.idle_timeout = None
+            self.connect()
+            if db_path and Path(db_path).resolve() != Path(self.db_path).resolve():
+                self.connection.close()
+                raise ConnectionError(
+                    f"Server at {self.socket_path} is serving {self.db_path} not {db_path}"
+                )
+
+        def connect(self):
+            """(Re)connect to the server, learning the database it serves"""
+            if self.connection:
+                self.connection.close()
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.connection.connect(self.socket_path)
+                self.last_response = time.monotonic()
+                response = self.request("ping")
+            except OSError:
+                self.connection.close()
+                raise
+            self.db_path = response["data"]
+            self.idle_timeout = response.get("idle_timeout")
+
+        def request(self, action: str, **kwargs) -> dict:
+            # Reconnect well before the server drops an idle connection, as a
+            # request sent just as it does would go unanswered
+            idle = time.monotonic() - self.last_response
+            if self.idle_timeout and idle > self.idle_timeout / 2:
+                self.connect()
+            FramedJSON.send(self.connection, dict(action=action, **kwargs))
+            response = FramedJSON.receive(self.connection)
+            if response is None:
+                raise ConnectionError(
+                    f"Server at {self.socket_path} closed the connection"
+                )
+            self.last_response = time.monotonic()
+            return response
+
+        def execute_sql_command(
+            self,
+            statement: str,
+            commit: bool = False,
+            parameters: t.Sequence = (),
+            timeout: float = None,
+            max_steps: int = None,
+            max_rows: int = None,
+        ) -> t.Tuple[t.Any]:
+            """Run sql statements against the served database"""
+            try:
+                response = self.request(
+                    "execute",
+                    statement=statement,
+                    commit=commit,
+                    parameters=list(parameters),
+                    timeout=self.timeout if timeout is None else timeout,
+                    max_steps=self.max_steps if max_steps is None else max_steps,
+                    max_rows=self.max_rows if max_rows is None else max_rows,
+                )
+            except Exception as e:
+                return (False, e)
+            if not response["success"]:
+                return (False, Exception(response["data"]))
+            # Only names make it across, as in `cursor.description` of a fresh query
+            headers = response["headers"]
+            self.last_description = (
+                tuple((name,) + (None,) * 6 for name in headers) if headers else None
+            )
+            return (True, [tuple(row) for row in response["data"]])
+
+        # Built purely on `execute_sql_command`, so they work over the socket as is
+        tables = Sqlite3Manager.tables
+        table_columns = Sqlite3Manager.table_columns
+        schema = Sqlite3Manager.schema
+        data_version = Sqlite3Manager.data_version
+
+        def commit(self):
+            """Commit changes"""
+            response = self.request("commit")
+            if not response["success"]:
+                raise Exception(response["data"])
+
+        def __call__(self, *args, **kwargs):
+            return self.execute_sql_command(*args, **kwargs)
+
+        def __enter__(self) -> "QueryClient":
+            return self
+
+        def __exit__(self) -> t.NoReturn:
+            """Close server connection"""
+            self.connection.close()
+
+
+class QueryWatcher:
+    """Re-run a query only when the database changes"""
+
+    def __init__(
+        self,
+        db_manager: Sqlite3Manager,
+        statement: str,
+        interval: float = 0.5,
+        min_refresh: float = 1.0,
+        key: t.Union[int, None] = None,
+    ):
+        """Initializes `QueryWatcher`
+
+        Args:
+            db_manager (Sqlite3Manager): Manager to poll. Should be in auto-commit mode
+                otherwise changes made by other connections won't be visible.
+            statement (str): Sql query to re-run.
+            interval (float, optional): Seconds between `PRAGMA data_version` polls. Defaults to 0.5.
+            min_refresh (float, optional): Minimum seconds between query re-runs. Defaults to 1.0.
+            key (t.Union[int, None], optional): Index of column uniquely identifying a row. Rows
+                sharing a key with different values are reported as changed. Defaults to None
+                (whole rows compared, duplicates counted).
+        """
+        self.db_manager = db_manager
+        self.statement = statement
+        self.interval = interval
+        self.min_refresh = min_refresh
+        self.key = key
+
+    @staticmethod
+    def diff(
+        previous: t.List[t.Tuple[t.Any]],
+        current: t.List[t.Tuple[t.Any]],
+        key: t.Union[int, None] = None,
+    ) -> t.Dict[str, t.List[t.Tuple[t.Any]]]:
+        """Rows added, removed and changed between two results"""
+        if key is None:
+            previous_rows = collections.Counter(previous)
+            current_rows = collections.Counter(current)
+            return {
+                "added": list((current_rows - previous_rows).elements()),
+                "removed": list((previous_rows - current_rows).elements()),
+                "changed": [],
+            }
+        previous_rows = {row[key]: row for row in previous}
+        current_rows = {row[key]: row for row in current}
+        if len(current_rows) < len(current):
+            logging.warning(
+                f"Column {key} isn't unique, rows sharing a key are merged."
+            )
+        return {
+            "added": [
+                row
+                for row_key, row in current_rows.items()
+                if row_key not in previous_rows
+            ],
+            "removed": [
+                row
+                for row_key, row in previous_rows.items()
+                if row_key not in current_rows
+            ],
+            "changed": [
+                row
+                for row_key, row in current_rows.items()
+                if row_key in previous_rows and previous_rows[row_key] != row
+            ],
+        }
+
+    def __iter__(self) -> t.Iterator[t.Dict[str, t.List[t.Tuple[t.Any]]]]:
+        """Yield differences from the previous result each time data changes"""
+        previous = []
+        last_version = None
+        last_run = None
+        while True:
+            version = self.db_manager.data_version()
+            if version != last_version:
+                if last_run is not None:
+                    time.sleep(max(0, self.min_refresh - (time.monotonic() - last_run)))
+                    version = self.db_manager.data_version()
+                success, current = self.db_manager.execute_sql_command(self.statement)
+                if not success:
+                    raise current
+                last_run = time.monotonic()
+                last_version = version
+                yield self.diff(previous, current, self.key)
+                previous = current
+            time.sleep(self.interval)
+
+
+class FanOut:
+    """Run the same statement against many databases on a process pool"""
+
+    aggregate_functions = ("sum", "count", "min", "max")
+
+    def __init__(
+        self,
+        databases: t.Sequence[t.Union[str, Path]],
+        statement: str,
+        jobs: int = None,
+        plugins: t.Sequence[str] = (),
+        limits: t.Dict[str, t.Any] = None,
+    ):
+        """Initializes `FanOut`
+
+        Args:
+            databases (t.Sequence[t.Union[str, Path]]): Paths leading to sqlite3 databases.
+            statement (str): Sql statement to run against each database.
+            jobs (int, optional): Maximum databases queried concurrently. Defaults to cpu count.
+            plugins (t.Sequence[str], optional): Modules adding sql functions. Defaults to ().
+            limits (t.Dict[str, t.Any], optional): timeout, max_steps and max_rows
+                applied to each database. See `Sqlite3Manager`. Defaults to None.
+        """
+        self.databases = databases
+        self.statement = statement
+        self.jobs = jobs or os.cpu_count() or 1
+        self.plugins = tuple(plugins)
+        self.limits = limits or {}
+
+    @staticmethod
+    def query_database(
+        db_path: t.Union[str, Path],
+        statement: str,
+        plugins: t.Sequence[str] = (),
+        limits: t.Dict[str, t.Any] = None,
+    ) -> t.Tuple[str, bool, t.List[str], t.Any]:
+        """Run statement against a single database [AUTO-COMMITS]
+
+        Returns:
+            t.Tuple[str, bool, t.List[str], t.Any]: Database path, success, column names
+                and either the rows or the error message.
+        """
+        try:
+            db_manager = Sqlite3Manager(
+                db_path, auto_commit=True, plugins=plugins, **(limits or {})
+            )
+        except Exception as e:
+            return (str(db_path), False, [], get_arg(e))
+        try:
+            success, rows = db_manager.execute_sql_command(statement)
+            if not success:
+                return (str(db_path), False, [], get_arg(rows))
+            headers = [column[0] for column in db_manager.last_description or ()]
+            return (str(db_path), True, headers, rows)
+        finally:
+            db_manager.__exit__()
+
+    @staticmethod
+    def stream_database(
+        db_path: t.Union[str, Path],
+        statement: str,
+        plugins: t.Sequence[str] = (),
+        limits: t.Dict[str, t.Any] = None,
+    ) -> t.Iterator[t.Tuple[str, bool, t.List[str], t.Any]]:
+        """Like `query_database` but yields rows in chunks fetched through
+        `Sqlite3Manager.iter_rows`, keeping memory bounded"""
+        limits = dict(limits or {})
+        max_rows = limits.pop("max_rows", None)
+        db_manager = None
+        try:
+            db_manager = Sqlite3Manager(
+                db_path, auto_commit=True, plugins=plugins, **limits
+            )
+            fetched = 0
+            for rows in db_manager.iter_rows(statement):
+                headers = [column[0] for column in db_manager.last_description]
+                if max_rows and fetched + len(rows) >= max_rows:
+                    yield (str(db_path), True, headers, rows[: max_rows - fetched])
+                    return
+                fetched += len(rows)
+                yield (str(db_path), True, headers, rows)
+            if not fetched:
+                headers = [column[0] for column in db_manager.last_description or ()]
+                yield (str(db_path), True, headers, [])
+        except Exception as e:
+            yield (str(db_path), False, [], get_arg(e))
+        finally:
+            if db_manager:
+                db_manager.__exit__()
+
+    def __iter__(self) -> t.Iterator[t.Tuple[str, bool, t.List[str], t.Any]]:
+        """Yield results of each database as soon as they're ready.
+        A single database is queried in-process, yielding its rows in chunks."""
+        if len(self.databases) == 1:
+            yield from self.stream_database(
+                self.databases[0], self.statement, self.plugins, self.limits
+            )
+            return
+        databases = iter(self.databases)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as executor:
+
+            def submit(db_paths: t.Iterable) -> set:
+                return {
+                    executor.submit(
+                        self.query_database,
+                        db_path,
+                        self.statement,
+                        self.plugins,
+                        self.limits,
+                    )
+                    for db_path in db_paths
+                }
+
+            # Bound the queued work so thousands of databases don't pile up results
+            pending = submit(itertools.islice(databases, self.jobs * 2))
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                pending |= submit(itertools.islice(databases, len(done)))
+                for future in done:
+                    yield future.result()
+
+    @staticmethod
+    def aggregate(
+        rows: t.Iterable[t.Tuple[t.Any]], function: str, state: list = None
+    ) -> list:
+        """Fold `rows` column-wise into `state` using sum, count, min or max.
+        Nulls are skipped and sum ignores non-numeric values.
+
+        Args:
+            rows (t.Iterable[t.Tuple[t.Any]]): Rows to be merged.
+            function (str): One of `FanOut.aggregate_functions`.
+            state (list, optional): Result of previous call to continue from. Defaults to None.
+
+        Returns:
+            list: Aggregated value of each column.
+        """
+        assert (
+            function in FanOut.aggregate_functions
+        ), f"Aggregate function must be one of {FanOut.aggregate_functions} not {function!r}"
+        for row in rows:
+            if state is None:
+                state = [0 if function == "count" else None] * len(row)
+            for index, value in enumerate(row):
+                current = state[index]
+                if value is None:
+                    continue
+                elif function == "count":
+                    state[index] = current + 1
+                elif function == "sum":
+                    if isinstance(value, (int, float)):
+                        state[index] = value if current is None else current + value
+                else:
+                    try:
+                        if current is None or (
+                            value < current if function == "min" else value > current
+                        ):
+                            state[index] = value
+                    except TypeError:
+                        logging.debug(f"Cannot compare {value!r} with {current!r}")
+        return state
+
+
+class Sampler:
+    """Estimate count, sum and average of huge tables from uniform random
+    samples drawn by probing random rowids, avoiding full table scans"""
+
+    headers = (
+        "group",
+        "column",
+        "rows",
+        "count",
+        "count_margin",
+        "avg",
+        "avg_margin",
+        "sum",
+        "sum_margin",
+    )
+
+    def __init__(
+        self,
+        db_manager: Sqlite3Manager,
+        table: str,
+        columns: t.Sequence[str] = (),
+        where: str = None,
+        group_by: str = None,
+        batch_size: int = 1000,
+        confidence: float = 0.95,
+    ):
+        """Initializes `Sampler`
+
+        Args:
+            db_manager (Sqlite3Manager): Manager of database containing the table.
+            table (str): Rowid table to sample.
+            columns (t.Sequence[str], optional): Numeric columns or expressions to estimate
+                sum and average of. Defaults to () (count only).
+            where (str, optional): Condition rows must meet to be counted. Defaults to None.
+            group_by (str, optional): Column or expression to group estimates by. Defaults to None.
+            batch_size (int, optional): Rowids probed per query. Defaults to 1000.
+            confidence (float, optional): Confidence level of margins of error. Defaults to 0.95.
+        """
+        self.db_manager = db_manager
+        self.table = table
+        self.columns = list(columns)
+        self.where = where
+        self.group_by = group_by
+        self.batch_size = batch_size
+        self.z_score = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        success, bounds = db_manager.execute_sql_command(
+            f"SELECT min(rowid), max(rowid) FROM {db_manager.quote_identifier(table)}"
+        )
+        if not success:
+            raise bounds
+        self.lowest, self.highest = bounds[0]
+        self.frame_size = (
+            self.highest - self.lowest + 1 if self.highest is not None else 0
+        )
+        self.probed: t.Set[int] = set()
+        # group -> [rows, [(non-null count, sum, sum of squares) of each column]]
+        self.groups: t.Dict[t.Any, list] = {}
+
+    @property
+    def exhausted(self) -> bool:
+        return len(self.probed) >= self.frame_size
+
+    def draw_rowids(self) -> t.List[int]:
+        """Random rowids not probed before"""
+        remaining = self.frame_size - len(self.probed)
+        if remaining <= self.batch_size:
+            rowids = [
+                rowid
+                for rowid in range(self.lowest, self.highest + 1)
+                if rowid not in self.probed
+            ]
+        else:
+            rowids = set()
+            while len(rowids) < self.batch_size:
+                rowid = random.randint(self.lowest, self.highest)
+                if rowid not in self.probed:
+                    rowids.add(rowid)
+            rowids = list(rowids)
+        self.probed.update(rowids)
+        return rowids
+
+    def sample_batch(self):
+        """Probe a batch of random rowids and accumulate rows found"""
+        rowids = self.draw_rowids()
+        if not rowids:
+            return
+        statement = (
+            f"SELECT {self.group_by or 'NULL'}"
+            + "".join(f", {column}" for column in self.columns)
+            + f" FROM {self.db_manager.quote_identifier(self.table)}"
+            + f" WHERE rowid IN ({', '.join('?' * len(rowids))})"
+            + (f" AND ({self.where})" if self.where else "")
+        )
+        success, rows = self.db_manager.execute_sql_command(
+            statement, parameters=rowids
+        )
+        if not success:
+            raise rows
+        for group, *values in rows:
+            if group not in self.groups:
+                self.groups[group] = [0, [[0, 0, 0] for _ in self.columns]]
+            accumulated = self.groups[group]
+            accumulated[0] += 1
+            for value, column_stats in zip(values, accumulated[1]):
+                if isinstance(value, (int, float)):
+                    column_stats[0] += 1
+                    column_stats[1] += value
+                    column_stats[2] += value * value
+
+    def refine(
+        self, sample_size: int = 100_000, time_budget: float = 5.0
+    ) -> t.Iterator["Sampler"]:
+        """Sample batch after batch, yielding after each, until `sample_size` rowids
+        have been probed, `time_budget` seconds elapse or the table is exhausted"""
+        deadline = time.monotonic() + time_budget if time_budget else None
+        while (
+            not self.exhausted
+            and len(self.probed) < sample_size
+            and (deadline is None or time.monotonic() < deadline)
+        ):
+            self.sample_batch()
+            yield self
+
+    def estimates(self) -> t.List[t.Tuple[t.Any]]:
+        """Estimates and margins of error of each group and column in `Sampler.headers` order"""
+        probes = len(self.probed)
+        if not probes:
+            return []
+        # Each probe is a draw without replacement from the rowid range, yielding
+        # 0 when rowid is missing or filtered out
+        correction = math.sqrt(max(0.0, 1 - probes / self.frame_size))
+
+        def margin(total: float, total_of_squares: float, size: int) -> float:
+            if size < 2:
+                return math.inf
+            variance = (total_of_squares - total * total / size) / (size - 1)
+            return self.z_score * math.sqrt(max(0.0, variance) / size)
+
+        estimates = []
+        for group, (rows, column_stats) in self.groups.items():
+            count = self.frame_size * rows / probes
+            count_margin = self.frame_size * margin(rows, rows, probes) * correction
+            if not self.columns:
+                estimates.append(
+                    (group, "*", rows, count, count_margin, None, None, None, None)
+                )
+            for column, (size, total, total_of_squares) in zip(
+                self.columns, column_stats
+            ):
+                estimates.append(
+                    (
+                        group,
+                        column,
+                        size,
+                        count,
+                        count_margin,
+                        total / size if size else None,
+                        margin(total, total_of_squares, size) if size else None,
+                        self.frame_size * total / probes,
+                        self.frame_size
+                        * margin(total, total_of_squares, probes)
+                        * correction,
+                    )
+                )
+        return estimates
+
+
+class FullTextIndex:
+    """External-content FTS5 index over text columns of a table,
+    kept in sync with it by triggers"""
+
+    suffix = "_fts"
+
+    def __init__(self, db_manager: Sqlite3Manager, table: str):
+        """Initializes `FullTextIndex`
+
+        Args:
+            db_manager (Sqlite3Manager): Manager of database containing the table.
+            table (str): Table whose rows are indexed.
+        """
+        self.db_manager = db_manager
+        self.table = table
+        self.name = table + self.suffix
+
+    @staticmethod
+    def indexes(db_manager: Sqlite3Manager) -> t.List[t.Tuple[str, str]]:
+        """Names of fts5 tables and the tables they index"""
+        success, entries = db_manager.execute_sql_command(
+            "SELECT name, sql FROM sqlite_schema WHERE type='table' "
+            "AND sql LIKE 'CREATE VIRTUAL TABLE%USING fts5%'"
+        )
+        if not success:
+            raise entries
+        return [
+            (
+                name,
+                (re.findall(r"content\s*=\s*'((?:[^']|'')+)'", sql) or [""])[0].replace(
+                    "''", "'"
+                ),
+            )
+            for name, sql in entries
+        ]
+
+    def create(self, columns: t.Sequence[str], tokenizer: str = "unicode61"):
+        """Create index over `columns`, its sync triggers and populate it"""
+        assert columns, "At least one column to be indexed is required"
+        quote = self.db_manager.quote_identifier
+        name, table = quote(self.name), quote(self.table)
+        column_list = ", ".join(quote(column) for column in columns)
+
+        def values(row: str) -> str:
+            return ", ".join(f"{row}.{quote(column)}" for column in columns)
+
+        def literal(text: str) -> str:
+            return "'" + text.replace("'", "''") + "'"
+
+        with self.db_manager.transaction() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {name} USING fts5({column_list}, "
+                f"content={literal(self.table)}, tokenize={literal(tokenizer)})"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {quote(self.name + '_ai')} AFTER INSERT ON {table} "
+                f"BEGIN INSERT INTO {name}(rowid, {column_list}) "
+                f"VALUES (new.rowid, {values('new')}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {quote(self.name + '_ad')} AFTER DELETE ON {table} "
+                f"BEGIN INSERT INTO {name}({name}, rowid, {column_list}) "
+                f"VALUES ('delete', old.rowid, {values('old')}); END"
+            )
+            cursor.execute(
+                # Any column, since rowid changes must reach the index too
+                f"CREATE TRIGGER {quote(self.name + '_au')} AFTER UPDATE ON {table} "
+                f"BEGIN INSERT INTO {name}({name}, rowid, {column_list}) "
+                f"VALUES ('delete', old.rowid, {values('old')}); "
+                f"INSERT INTO {name}(rowid, {column_list}) "
+                f"VALUES (new.rowid, {values('new')}); END"
+            )
+            cursor.execute(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+    def rebuild(self, optimize: bool = False):
+        """Re-index all rows of the table and optionally merge index segments"""
+        name = self.db_manager.quote_identifier(self.name)
+        with self.db_manager.transaction() as cursor:
+            cursor.execute(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+            if optimize:
+                cursor.execute(f"INSERT INTO {name}({name}) VALUES ('optimize')")
+
+    def drop(self):
+        """Remove index and its triggers"""
+        quote = self.db_manager.quote_identifier
+        with self.db_manager.transaction() as cursor:
+            for trigger in ("_ai", "_ad", "_au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {quote(self.name + trigger)}")
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(self.name)}")
+
+    def search(
+        self, query: str, limit: int = 20
+    ) -> t.Tuple[t.List[str], t.List[t.Tuple]]:
+        """Rows of the table matching fts5 `query`, best matches first
+
+        Returns:
+            t.Tuple[t.List[str], t.List[t.Tuple]]: Column names and rows, the first
+                column being the bm25 rank (lower is better).
+        """
+        name = self.db_manager.quote_identifier(self.name)
+        table = self.db_manager.quote_identifier(self.table)
+        success, rows = self.db_manager.execute_sql_command(
+            f"SELECT bm25({name}) AS rank, {table}.* FROM {name} "
+            f"JOIN {table} ON {table}.rowid = {name}.rowid "
+            f"WHERE {name} MATCH ? ORDER BY rank LIMIT ?",
+            parameters=(query, limit),
+        )
+        if not success:
+            raise rows
+        return [column[0] for column in self.db_manager.last_description], rows
+
+
 class TextToSql:
     """Generate SQL Statement based on given prompt"""
 
@@ -145,7 +1503,8 @@ class TextToSql:
             os.remove(history_file)
         self.ai = AUTO(is_conversation=follow_up, filepath=str(history_file))
         assert isinstance(
-            db_manager, Sqlite3Manager
+            db_manager,
+            (Sqlite3Manager, QueryClient) if unix_sockets else Sqlite3Manager,
         ), f"db_manager must be an instance of {Sqlite3Manager} not {type(db_manager)}"
         self.db_manager = db_manager
         self.sql_pattern = r"\{([\w\W]*)\}"
@@ -211,6 +1570,23 @@ class TextToSql:
         """
             )
         )
+        full_text_indexes = FullTextIndex.indexes(self.db_manager)
+        if full_text_indexes:
+            prompt += (
+                """5. Some tables have full-text indexes, listed below as table - index.
+        Search their text columns using the index instead of LIKE '%term%'.
+
+        For example:
+
+        User: List Linux distros mentioning debian
+        LLM : {SELECT Linux.* FROM Linux_fts JOIN Linux ON Linux.rowid = Linux_fts.rowid WHERE Linux_fts MATCH 'debian' ORDER BY rank;}
+        \n"""
+                + "\n    "
+                + "\n    ".join(
+                    f"{table} - {index}" for index, table in full_text_indexes
+                )
+                + "\n"
+            )
 
         return prompt
 
@@ -294,11 +1670,17 @@ class Interactive(cmd.Cmd):
         color,
         ai,
         follow_up,
+        plugins=(),
+        timeout=None,
+        max_steps=None,
+        max_rows=None,
     ):
         super().__init__()
         self.__start_time = time.time()
         self.__end_time = time.time()
-        self.db_manager = Sqlite3Manager(db_path, auto_commit)
+        self.db_manager = Sqlite3Manager(
+            db_path, auto_commit, plugins, timeout, max_steps, max_rows
+        )
         self.disable_coloring = disable_coloring
         self.json = json
         self.yes = yes
@@ -501,6 +1883,54 @@ class Interactive(cmd.Cmd):
         else:
             click.secho("Table name is required.", fg="yellow")
 
+    @cli_error_handler
+    def do_watch(self, line):
+        """Re-run sql query whenever database changes
+        Usage:
+            watch <sql-statement>"""
+        if not line:
+            click.secho("Sql statement is required.", fg="yellow")
+            return
+        # Separate connection so that this session's open transaction
+        # doesn't hide changes committed by others
+        watcher = QueryWatcher(
+            Sqlite3Manager(
+                self.db_manager.db_path,
+                auto_commit=True,
+                plugins=self.db_manager.plugins,
+            ),
+            line,
+        )
+        try:
+            Commands.stdout_changes(
+                watcher, json=self.json, color=self.color, db_manager=self.db_manager
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.db_manager.__exit__()
+
+    @cli_error_handler
+    def do_limits(self, line):
+        """Show or set statement limits, 0 lifting them
+        Usage:
+            limits [timeout=<seconds>] [max_steps=<steps>] [max_rows=<rows>]"""
+        converters = {"timeout": float, "max_steps": int, "max_rows": int}
+        for assignment in line.split():
+            name, _, value = assignment.partition("=")
+            assert name in converters, f"Unknown limit {name!r}"
+            setattr(self.db_manager, name, converters[name](value) or None)
+        Commands.stdout_data(
+            True,
+            [
+                (name, getattr(self.db_manager, name) or "unlimited")
+                for name in converters
+            ],
+            json=self.json,
+            color=self.color,
+            headers=["limit", "value"],
+        )
+
     def do_redo(self, line):
         """Re-run previous sql command"""
         history = self.completer_session.history.get_strings()
@@ -589,6 +2019,7 @@ class Commands:
         sql_query: str = None,
         db_manager: Sqlite3Manager = None,
         tbl: str = None,
+        blob_preview: int = 16,
     ):
         """Stdout table data if any.
 
@@ -600,6 +2031,7 @@ class Commands:
             sql_query (str, optional): Sql statement used to make the query.
             db_manager (Sqlite3Manager, optional)
             tbl (str, optional): Table name where * has been sourced from.
+            blob_preview (int, optional): Leading bytes of blobs to show in hex. Defaults to 16.
         """
 
         if not success:
@@ -654,6 +2086,14 @@ class Commands:
             if json:
                 entry_items = {}
                 for index, entry in enumerate(data):
+                    entry = [
+                        (
+                            Commands.format_blob(token, blob_preview)
+                            if isinstance(token, (bytes, bytearray, memoryview))
+                            else token
+                        )
+                        for token in entry
+                    ]
                     if headers:
                         entry = dict(zip(headers, entry))
 
@@ -663,21 +2103,108 @@ class Commands:
                 return
             else:
                 for index, entry in enumerate(data):
-                    table.add_row(*[str(index)] + [str(token) for token in entry])
+                    table.add_row(
+                        *[str(index)]
+                        + [
+                            (
+                                Commands.format_blob(token, blob_preview)
+                                if isinstance(token, (bytes, bytearray, memoryview))
+                                else str(token)
+                            )
+                            for token in entry
+                        ]
+                    )
                 rich.print(table)
 
+    @staticmethod
+    def format_blob(blob: bytes, preview: int = 16) -> str:
+        """Blob size and hex of its leading `preview` bytes"""
+        if preview <= 0 or not blob:
+            return f"<BLOB {len(blob)} bytes>"
+        ellipsis = "..." if len(blob) > preview else ""
+        return f"<BLOB {len(blob)} bytes {bytes(blob[:preview]).hex()}{ellipsis}>"
+
     @staticmethod
     @click.command()
     @click.argument(
         "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
     )
     @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
-    def show_tables(database, json):
+    @click.option(
+        "--server",
+        envvar=server_socket_env_var,
+        is_flag=False,
+        flag_value=default_server_socket,
+        help="Use warm connection of a running `serve` instance at this socket",
+    )
+    def show_tables(database, json, server):
         """List tables contained in the database"""
-        db_manager = Sqlite3Manager(database)
+        db_manager = Commands.get_db_manager(database, server)
         success, tables = db_manager.tables()
         Commands.stdout_data(success, tables, json=json, headers=table_headers)
 
+    @staticmethod
+    def stdout_changes(
+        watcher: QueryWatcher,
+        json: bool = False,
+        color: str = "cyan",
+        db_manager: Sqlite3Manager = None,
+    ):
+        """Stdout rows added, removed and changed each time `watcher` re-runs its query"""
+        colors = {"added": "green", "removed": "red", "changed": "yellow"}
+        for changes in watcher:
+            current_time = datetime.datetime.now().strftime("%H:%M:%S")
+            for change, rows in changes.items():
+                if rows:
+                    Commands.stdout_data(
+                        True,
+                        rows,
+                        color=colors.get(change, color),
+                        title=f"{change.capitalize()} - {current_time}",
+                        json=json,
+                        sql_query=watcher.statement,
+                        db_manager=db_manager,
+                    )
+
+    @staticmethod
+    @click.command()
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.option("-s", "--sql", help="Sql query to re-run", required=True)
+    @click.option(
+        "-i",
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Seconds between change checks",
+        show_default=True,
+    )
+    @click.option(
+        "-m",
+        "--min-refresh",
+        type=float,
+        default=1.0,
+        help="Minimum seconds between query re-runs",
+        show_default=True,
+    )
+    @click.option(
+        "-k",
+        "--key",
+        type=int,
+        help="Index of column uniquely identifying a row, reporting its updates as "
+        "changes  [default: compare whole rows]",
+    )
+    @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
+    def watch(database, sql, interval, min_refresh, key, json):
+        """Re-run sql query whenever database changes"""
+        db_manager = Sqlite3Manager(database, auto_commit=True)
+        watcher = QueryWatcher(db_manager, sql, interval, min_refresh, key)
+        try:
+            Commands.stdout_changes(watcher, json=json, db_manager=db_manager)
+        except KeyboardInterrupt:
+            pass
+
     @staticmethod
     @click.command()
     @click.argument(
@@ -685,16 +2212,27 @@ class Commands:
     )
     @click.argument("table")
     @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
-    def show_columns(database, table, json):
+    @click.option(
+        "--server",
+        envvar=server_socket_env_var,
+        is_flag=False,
+        flag_value=default_server_socket,
+        help="Use warm connection of a running `serve` instance at this socket",
+    )
+    def show_columns(database, table, json, server):
         """List columns for a particular table"""
-        db_manager = Sqlite3Manager(database)
+        db_manager = Commands.get_db_manager(database, server)
         success, tables = db_manager.table_columns(table)
         Commands.stdout_data(success, tables, json=json, headers=table_column_headers)
 
     @staticmethod
     @click.command()
-    @click.argument(
-        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    @click.argument("databases", nargs=-1)
+    @click.option(
+        "-D",
+        "--databases-from",
+        type=click.File(),
+        help="File listing database paths, one per line",
     )
     @click.option(
         "-s", "--sql", multiple=True, help="Sql statement or prompt", required=True
@@ -704,9 +2242,79 @@ class Commands:
     )
     @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
     @click.option("-q", "--quiet", is_flag=True, help="Do not stdout results")
-    def execute(database, sql, ai, json, quiet):
-        """Run sql statements against database [AUTO-COMMITS]"""
-        db_manager = Sqlite3Manager(database, auto_commit=True)
+    @click.option(
+        "-b",
+        "--blob-preview",
+        type=int,
+        default=16,
+        help="Leading bytes of blobs to show in hex, 0 for size only",
+        show_default=True,
+    )
+    @click.option(
+        "--server",
+        envvar=server_socket_env_var,
+        is_flag=False,
+        flag_value=default_server_socket,
+        help="Use warm connection of a running `serve` instance at this socket",
+    )
+    @click.option(
+        "-J",
+        "--jobs",
+        type=int,
+        help="Databases queried concurrently when given several  [default: cpu count]",
+    )
+    @click.option(
+        "-A",
+        "--aggregate",
+        type=click.Choice(FanOut.aggregate_functions),
+        help="Merge results of several databases column-wise",
+    )
+    @click.option(
+        "-F",
+        "--functions",
+        multiple=True,
+        help="Python module or file adding sql functions via register(registry)",
+    )
+    @click.option(
+        "-T",
+        "--timeout",
+        type=float,
+        help="Seconds each statement may run for",
+    )
+    @click.option(
+        "-M",
+        "--max-steps",
+        type=int,
+        help="Virtual machine steps each statement may take",
+    )
+    @click.option(
+        "-R",
+        "--max-rows",
+        type=int,
+        help="Rows to fetch per statement",
+    )
+    def execute(
+        databases,
+        databases_from,
+        sql,
+        ai,
+        json,
+        quiet,
+        blob_preview,
+        server,
+        jobs,
+        aggregate,
+        functions,
+        timeout,
+        max_steps,
+        max_rows,
+    ):
+        """Run sql statements against DATABASES (paths or glob patterns) [AUTO-COMMITS]"""
+        databases = Commands.resolve_databases(databases, databases_from)
+        limits = dict(timeout=timeout, max_steps=max_steps, max_rows=max_rows)
+        db_manager = Commands.get_db_manager(
+            databases[0], server, auto_commit=True, plugins=functions, **limits
+        )
         if ai:
             text_to_sql = TextToSql(db_manager)
             ai_gen_sql_statements = []
@@ -714,12 +2322,224 @@ class Commands:
                 ai_gen_sql_statements.extend(text_to_sql.generate(prompt))
 
         for sql_statement in sql if not ai else ai_gen_sql_statements:
+            if len(databases) > 1:
+                Commands.stdout_fan_out(
+                    FanOut(databases, sql_statement, jobs, functions, limits),
+                    json=json,
+                    quiet=quiet,
+                    blob_preview=blob_preview,
+                    aggregate=aggregate,
+                )
+                continue
             success, tables = db_manager.execute_sql_command(sql_statement)
             if not quiet:
                 Commands.stdout_data(
-                    success, tables, json=json, sql_query=sql_statement
+                    success,
+                    tables,
+                    json=json,
+                    sql_query=sql_statement,
+                    blob_preview=blob_preview,
                 )
 
+    @staticmethod
+    @click.command()
+    @click.argument("databases", nargs=-1)
+    @click.option(
+        "-D",
+        "--databases-from",
+        type=click.File(),
+        help="File listing database paths, one per line",
+    )
+    @click.option(
+        "-s", "--sql", help="Sql query whose results to export", required=True
+    )
+    @click.option(
+        "-o",
+        "--output",
+        type=click.File("w"),
+        default="-",
+        help="File to save results to",
+        show_default=True,
+    )
+    @click.option(
+        "-f",
+        "--format",
+        "output_format",
+        type=click.Choice(["csv", "json"]),
+        default="csv",
+        help="Output format, json being one object per line",
+        show_default=True,
+    )
+    @click.option(
+        "-J",
+        "--jobs",
+        type=int,
+        help="Databases queried concurrently when given several  [default: cpu count]",
+    )
+    @click.option(
+        "-A",
+        "--aggregate",
+        type=click.Choice(FanOut.aggregate_functions),
+        help="Merge results of several databases column-wise",
+    )
+    @click.option(
+        "-F",
+        "--functions",
+        multiple=True,
+        help="Python module or file adding sql functions via register(registry)",
+    )
+    def export(
+        databases,
+        databases_from,
+        sql,
+        output,
+        output_format,
+        jobs,
+        aggregate,
+        functions,
+    ):
+        """Save query results from DATABASES (paths or glob patterns) [AUTO-COMMITS]"""
+        databases = Commands.resolve_databases(databases, databases_from)
+        tag_source = len(databases) > 1 and not aggregate
+        writer = csv.writer(output) if output_format == "csv" else None
+        expected_headers = columns = keys = None
+        state = None
+
+        def write_rows(rows: t.Iterable[t.Sequence[t.Any]]):
+            for row in rows:
+                # Blobs as hex in either format, readable back with unhex()
+                row = [
+                    (
+                        token.hex()
+                        if isinstance(token, (bytes, bytearray, memoryview))
+                        else token
+                    )
+                    for token in row
+                ]
+                if writer:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(dict(zip(keys, row))) + "\n")
+
+        for db_path, success, headers, rows in FanOut(databases, sql, jobs, functions):
+            if not success:
+                click.secho(f"> Error - {db_path} - {rows}", fg="red", err=True)
+                continue
+            if columns is None:
+                expected_headers = headers
+                columns = (["database"] if tag_source else []) + headers
+                keys = unique_names(columns)
+                if writer:
+                    writer.writerow(columns)
+            elif headers != expected_headers:
+                click.secho(
+                    f"> Skipped - {db_path} - columns {headers} differ from "
+                    f"{expected_headers}",
+                    fg="yellow",
+                    err=True,
+                )
+                continue
+            if aggregate:
+                state = FanOut.aggregate(rows, aggregate, state)
+            elif tag_source:
+                write_rows((db_path, *row) for row in rows)
+            else:
+                write_rows(rows)
+        if aggregate and state is not None:
+            write_rows([state])
+
+    @staticmethod
+    def resolve_databases(
+        databases: t.Sequence[str], databases_from: t.TextIO = None
+    ) -> t.List[str]:
+        """Expand glob patterns and database listing into absolute paths"""
+        patterns = list(databases)
+        if databases_from:
+            patterns.extend(line.strip() for line in databases_from if line.strip())
+        resolved = []
+        for pattern in patterns:
+            if glob.has_magic(pattern):
+                matches = sorted(glob.glob(pattern))
+            elif os.path.isfile(pattern):
+                matches = [pattern]
+            else:
+                raise click.BadParameter(
+                    f"Database {pattern!r} does not exist.", param_hint="DATABASES"
+                )
+            resolved.extend(
+                os.path.abspath(match) for match in matches if os.path.isfile(match)
+            )
+        if not resolved:
+            raise click.BadParameter("No database matched.", param_hint="DATABASES")
+        return resolved
+
+    @staticmethod
+    def stdout_fan_out(
+        fan_out: FanOut,
+        json: bool = False,
+        quiet: bool = False,
+        blob_preview: int = 16,
+        aggregate: str = None,
+    ):
+        """Stdout results of all databases as one table, as json lines tagged with
+        their database as they arrive, or their aggregate"""
+        columns = None
+        state = None
+        merged_rows = []
+
+        def print_json_line(keys: t.List[str], row: t.Sequence[t.Any]):
+            row = [
+                (
+                    Commands.format_blob(token, blob_preview)
+                    if isinstance(token, (bytes, bytearray, memoryview))
+                    else token
+                )
+                for token in row
+            ]
+            rich.print_json(data=dict(zip(keys, row)), indent=None)
+
+        for db_path, success, headers, rows in fan_out:
+            if not success:
+                click.secho(f"> Error - {db_path} - {rows}", fg="red", err=True)
+                continue
+            if columns is None:
+                columns = headers
+            elif headers != columns and not json:
+                click.secho(
+                    f"> Skipped - {db_path} - columns {headers} differ from {columns}",
+                    fg="yellow",
+                    err=True,
+                )
+                continue
+            if aggregate:
+                state = FanOut.aggregate(rows, aggregate, state)
+            elif quiet:
+                continue
+            elif json:
+                keys = unique_names(["database"] + headers)
+                for row in rows:
+                    print_json_line(keys, (db_path, *row))
+            else:
+                merged_rows.extend((db_path, *row) for row in rows)
+        if merged_rows:
+            Commands.stdout_data(
+                True,
+                merged_rows,
+                headers=["database"] + columns,
+                blob_preview=blob_preview,
+            )
+        if aggregate and state is not None and not quiet:
+            if json:
+                print_json_line(unique_names(columns), state)
+                return
+            Commands.stdout_data(
+                True,
+                [tuple(state)],
+                title=f"{aggregate} of {len(fan_out.databases)} databases",
+                headers=columns,
+                blob_preview=blob_preview,
+            )
+
     @staticmethod
     @click.command()
     @click.argument("database", type=click.Path(exists=True, dir_okay=False))
@@ -758,6 +2578,30 @@ class Commands:
     @click.option(
         "-N", "--new-history-thread", is_flag=True, help="Start a new history thread"
     )
+    @click.option(
+        "-F",
+        "--functions",
+        multiple=True,
+        help="Python module or file adding sql functions via register(registry)",
+    )
+    @click.option(
+        "-T",
+        "--timeout",
+        type=float,
+        help="Seconds each statement may run for",
+    )
+    @click.option(
+        "-M",
+        "--max-steps",
+        type=int,
+        help="Virtual machine steps each statement may take",
+    )
+    @click.option(
+        "-R",
+        "--max-rows",
+        type=int,
+        help="Rows to fetch per statement",
+    )
     def interactive(
         database,
         color,
@@ -769,6 +2613,10 @@ class Commands:
         disable_coloring,
         disable_suggestions,
         new_history_thread,
+        functions,
+        timeout,
+        max_steps,
+        max_rows,
     ):
         """Execute sql statements interactively"""
         main = Interactive(
@@ -782,9 +2630,313 @@ class Commands:
             color=color,
             ai=ai,
             follow_up=follow_up,
+            plugins=functions,
+            timeout=timeout,
+            max_steps=max_steps,
+            max_rows=max_rows,
         )
         main.cmdloop()
 
+    @staticmethod
+    @click.command()
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.option(
+        "-s",
+        "--socket",
+        "socket_path",
+        envvar=server_socket_env_var,
+        default=default_server_socket,
+        help="Unix socket to listen on",
+        show_default=True,
+    )
+    @click.option(
+        "-F",
+        "--functions",
+        multiple=True,
+        help="Python module or file adding sql functions via register(registry)",
+    )
+    def serve(database, socket_path, functions):
+        """Serve database over a unix socket [AUTO-COMMITS]"""
+        db_manager = Sqlite3Manager(database, auto_commit=True, plugins=functions)
+        with QueryServer(socket_path, db_manager) as server:
+            logging.info(f"Serving {database} at {socket_path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logging.info("Server stopped.")
+
+    @staticmethod
+    @click.command("get")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.argument("column")
+    @click.argument("rowid", type=int)
+    @click.argument("output", type=click.File("wb"))
+    @click.option(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=blob_chunk_size,
+        help="Bytes to read at a time",
+        show_default=True,
+    )
+    def blob_get(database, table, column, rowid, output, chunk_size):
+        """Save blob content to OUTPUT file ('-' for stdout)"""
+        db_manager = Sqlite3Manager(database)
+        written = db_manager.read_blob(table, column, rowid, output, chunk_size)
+        logging.info(f"Saved {written} bytes from {table}.{column} row {rowid}")
+
+    @staticmethod
+    @click.command("put")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.argument("column")
+    @click.argument("rowid", type=int)
+    @click.argument("input", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=blob_chunk_size,
+        help="Bytes to write at a time",
+        show_default=True,
+    )
+    def blob_put(database, table, column, rowid, input, chunk_size):
+        """Replace blob content with that of INPUT file [AUTO-COMMITS]"""
+        db_manager = Sqlite3Manager(database, auto_commit=True)
+        with open(input, "rb") as source:
+            written = db_manager.write_blob(
+                table, column, rowid, source, os.path.getsize(input), chunk_size
+            )
+        logging.info(f"Stored {written} bytes into {table}.{column} row {rowid}")
+
+    @staticmethod
+    def estimates_table(sampler: Sampler, color: str = "cyan") -> Table:
+        """Table of `sampler` estimates as `value ± margin`"""
+
+        def display(value: t.Any, margin: t.Any = None) -> str:
+            if value is None:
+                return "-"
+            text = f"{value:,.2f}" if isinstance(value, float) else str(value)
+            if margin is not None:
+                text += " ± " + (f"{margin:,.2f}" if math.isfinite(margin) else "∞")
+            return text
+
+        table = Table(
+            title=f"Sampled {len(sampler.probed):,} of {sampler.frame_size:,} rowids",
+            show_lines=True,
+            style=color,
+        )
+        for header in ("Group", "Column", "Rows", "Count", "Avg", "Sum"):
+            table.add_column(header)
+        for group, column, rows, *estimates in sampler.estimates():
+            table.add_row(
+                str(group),
+                column,
+                str(rows),
+                *[
+                    display(value, margin)
+                    for value, margin in zip(estimates[::2], estimates[1::2])
+                ],
+            )
+        return table
+
+    @staticmethod
+    @click.command()
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.option(
+        "-c",
+        "--column",
+        "columns",
+        multiple=True,
+        help="Numeric column or expression to estimate sum and average of",
+    )
+    @click.option("-w", "--where", help="Condition rows must meet to be counted")
+    @click.option("-g", "--group-by", help="Column or expression to group by")
+    @click.option(
+        "-n",
+        "--sample-size",
+        type=int,
+        default=100_000,
+        help="Maximum rowids to probe",
+        show_default=True,
+    )
+    @click.option(
+        "-t",
+        "--time-budget",
+        type=float,
+        default=5.0,
+        help="Seconds to keep refining estimates for, 0 for unlimited",
+        show_default=True,
+    )
+    @click.option(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Rowids probed per query",
+        show_default=True,
+    )
+    @click.option(
+        "--confidence",
+        type=click.FloatRange(0, 1, min_open=True, max_open=True),
+        default=0.95,
+        help="Confidence level of margins of error",
+        show_default=True,
+    )
+    @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
+    def sample(
+        database,
+        table,
+        columns,
+        where,
+        group_by,
+        sample_size,
+        time_budget,
+        batch_size,
+        confidence,
+        json,
+    ):
+        """Estimate count, avg and sum of TABLE from a random sample of rows"""
+        sampler = Sampler(
+            Sqlite3Manager(database),
+            table,
+            columns,
+            where,
+            group_by,
+            batch_size,
+            confidence,
+        )
+        try:
+            if json:
+                for _ in sampler.refine(sample_size, time_budget):
+                    pass
+            else:
+                with Live(Commands.estimates_table(sampler)) as live:
+                    for _ in sampler.refine(sample_size, time_budget):
+                        live.update(Commands.estimates_table(sampler))
+        except (KeyboardInterrupt, QueryInterrupted):
+            logging.info("Sampling stopped, showing estimates so far.")
+        if json:
+            Commands.stdout_data(
+                True, sampler.estimates(), json=True, headers=Sampler.headers
+            )
+
+    @staticmethod
+    @click.command("create")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.option(
+        "-c",
+        "--column",
+        "columns",
+        multiple=True,
+        required=True,
+        help="Text column to index",
+    )
+    @click.option(
+        "-t",
+        "--tokenizer",
+        default="unicode61",
+        help="Fts5 tokenizer e.g 'porter unicode61'",
+        show_default=True,
+    )
+    def fts_create(database, table, columns, tokenizer):
+        """Index text columns of TABLE into TABLE_fts"""
+        FullTextIndex(Sqlite3Manager(database), table).create(columns, tokenizer)
+        logging.info(f"Created full-text index {table}{FullTextIndex.suffix}")
+
+    @staticmethod
+    @click.command("rebuild")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.option(
+        "-o", "--optimize", is_flag=True, help="Merge index segments after rebuilding"
+    )
+    def fts_rebuild(database, table, optimize):
+        """Re-index all rows of TABLE"""
+        FullTextIndex(Sqlite3Manager(database), table).rebuild(optimize)
+        logging.info(f"Rebuilt full-text index {table}{FullTextIndex.suffix}")
+
+    @staticmethod
+    @click.command("drop")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    def fts_drop(database, table):
+        """Remove full-text index of TABLE and its triggers"""
+        FullTextIndex(Sqlite3Manager(database), table).drop()
+        logging.info(f"Dropped full-text index {table}{FullTextIndex.suffix}")
+
+    @staticmethod
+    @click.command("list")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
+    def fts_list(database, json):
+        """List full-text indexes"""
+        Commands.stdout_data(
+            True,
+            FullTextIndex.indexes(Sqlite3Manager(database)),
+            json=json,
+            headers=["index", "table"],
+        )
+
+    @staticmethod
+    @click.command("search")
+    @click.argument(
+        "database", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+    )
+    @click.argument("table")
+    @click.argument("query")
+    @click.option(
+        "-l",
+        "--limit",
+        type=int,
+        default=20,
+        help="Maximum matches to show",
+        show_default=True,
+    )
+    @click.option("-j", "--json", is_flag=True, help="Stdout results in json format")
+    def fts_search(database, table, query, limit, json):
+        """Rows of TABLE matching fts5 QUERY, best first"""
+        headers, rows = FullTextIndex(Sqlite3Manager(database), table).search(
+            query, limit
+        )
+        Commands.stdout_data(True, rows, json=json, headers=headers)
+
+    @staticmethod
+    def get_db_manager(
+        database: str,
+        server: str = None,
+        auto_commit: bool = False,
+        plugins: t.Sequence[str] = (),
+        **limits,
+    ) -> t.Union[Sqlite3Manager, "QueryClient"]:
+        """Connect through a running server if any, otherwise open database directly.
+        Sql functions available through the server are those it was started with."""
+        if server and unix_sockets:
+            try:
+                return QueryClient(server, database, **limits)
+            except OSError as e:
+                logging.debug(f"Server at {server} unavailable - {get_arg(e)}")
+        return Sqlite3Manager(database, auto_commit, plugins, **limits)
+
     @staticmethod
     def build_commands() -> object:
         @click.group()
@@ -796,11 +2948,37 @@ class Commands:
         db_manager.add_command(Commands.show_tables)
         db_manager.add_command(Commands.show_columns)
         db_manager.add_command(Commands.execute)
+        db_manager.add_command(Commands.export)
+        db_manager.add_command(Commands.sample)
         db_manager.add_command(Commands.interactive)
+        if unix_sockets:
+            db_manager.add_command(Commands.serve)
+        db_manager.add_command(Commands.watch)
+
+        @db_manager.group()
+        def blob():
+            """Stream blob content from and into files"""
+            pass
+
+        blob.add_command(Commands.blob_get)
+        blob.add_command(Commands.blob_put)
+
+        @db_manager.group()
+        def fts():
+            """Manage and search full-text indexes"""
+            pass
+
+        fts.add_command(Commands.fts_create)
+        fts.add_command(Commands.fts_rebuild)
+        fts.add_command(Commands.fts_drop)
+        fts.add_command(Commands.fts_list)
+        fts.add_command(Commands.fts_search)
         return db_manager
 
 
 if __name__ == "__main__":
+    # Needed by the process pool in frozen executables
+    multiprocessing.freeze_support()
     try:
         Commands.build_commands()()
     except Exception as e:
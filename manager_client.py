@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""Lightweight client of `manager.py serve`
+
+Only the standard library is imported, so each run costs interpreter startup
+and a socket round trip instead of loading the terminal libraries `manager.py`
+depends on. Falls back to opening the database directly when no server is up.
+
+    $ python manager_client.py test.db -s "SELECT * FROM Linux" -f json
+"""
+
+import os
+import sys
+import csv
+import json
+import socket
+import struct
+import sqlite3
+import argparse
+import typing as t
+from pathlib import Path
+
+server_socket_env_var = "SQLITE3_MANAGER_SERVER"
+
+default_server_socket = str(Path.home() / ".sqlite3-cli-manager.sock")
+
+unix_sockets = hasattr(socket, "AF_UNIX")
+"""Whether the platform has unix domain sockets, which Windows builds may lack"""
+
+
+class FramedJSON:
+    """Length-prefixed json messages exchanged over a stream socket"""
+
+    header = struct.Struct(">I")
+
+    @staticmethod
+    def encode_value(value: t.Any) -> t.Any:
+        if isinstance(value, bytes):
+            return {"__blob__": value.hex()}
+        raise TypeError(f"Object of type {type(value)} is not json serializable")
+
+    @staticmethod
+    def decode_value(value: dict) -> t.Any:
+        if "__blob__" in value and len(value) == 1:
+            return bytes.fromhex(value["__blob__"])
+        return value
+
+    @staticmethod
+    def send(connection: socket.socket, message: dict):
+        """Send `message` prefixed with its length"""
+        payload = json.dumps(message, default=FramedJSON.encode_value).encode()
+        connection.sendall(FramedJSON.header.pack(len(payload)) + payload)
+
+    @staticmethod
+    def receive(connection: socket.socket) -> t.Union[dict, None]:
+        """Receive one message. Returns None once the peer closes the connection"""
+
+        def read_exactly(size: int) -> t.Union[bytes, None]:
+            chunks = bytearray()
+            while len(chunks) < size:
+                chunk = connection.recv(size - len(chunks))
+                if not chunk:
+                    return None
+                chunks.extend(chunk)
+            return bytes(chunks)
+
+        header = read_exactly(FramedJSON.header.size)
+        if header is None:
+            return None
+        payload = read_exactly(FramedJSON.header.unpack(header)[0])
+        if payload is None:
+            return None
+        return json.loads(payload, object_hook=FramedJSON.decode_value)
+
+
+def query(
+    database: t.Union[str, Path],
+    statement: str,
+    socket_path: t.Union[str, Path] = default_server_socket,
+    parameters: t.Sequence = (),
+) -> t.Tuple[t.List[str], t.List[t.List[t.Any]]]:
+    """Run `statement` through the server at `socket_path` if it is serving
+    `database`, otherwise against `database` directly. Changes are committed.
+
+    Returns:
+        t.Tuple[t.List[str], t.List[t.List[t.Any]]]: Column names and rows.
+    """
+    connection = None
+    if unix_sockets:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(str(socket_path))
+        except OSError:
+            connection.close()
+            connection = None
+    if connection:
+        with connection:
+            FramedJSON.send(connection, {"action": "ping"})
+            served = FramedJSON.receive(connection)
+            if served and Path(served["data"]).resolve() == Path(database).resolve():
+                FramedJSON.send(
+                    connection,
+                    {
+                        "action": "execute",
+                        "statement": statement,
+                        "parameters": list(parameters),
+                    },
+                )
+                response = FramedJSON.receive(connection)
+                if response is None:
+                    raise ConnectionError(
+                        f"Server at {socket_path} closed the connection"
+                    )
+                if not response["success"]:
+                    raise Exception(response["data"])
+                return response["headers"], response["data"]
+    db_connection = sqlite3.connect(database, autocommit=True)
+    try:
+        cursor = db_connection.execute(statement, parameters)
+        return [column[0] for column in cursor.description or ()], cursor.fetchall()
+    finally:
+        db_connection.close()
+
+
+def main(args: t.Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Run sql statements against DATABASE, through a running "
+        "`manager.py serve` when available [AUTO-COMMITS]"
+    )
+    parser.add_argument("database", help="Path to sqlite3 database")
+    parser.add_argument(
+        "-s",
+        "--sql",
+        action="append",
+        required=True,
+        help="Sql statement, can be given several times",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["csv", "json"],
+        default="csv",
+        help="Output format, json being one object per line (default: csv)",
+    )
+    parser.add_argument(
+        "--server",
+        default=os.environ.get(server_socket_env_var, default_server_socket),
+        help=f"Socket of running server (default: ${server_socket_env_var} "
+        f"or {default_server_socket})",
+    )
+    args = parser.parse_args(args)
+    writer = csv.writer(sys.stdout) if args.format == "csv" else None
+    for statement in args.sql:
+        try:
+            headers, rows = query(args.database, statement, args.server)
+        except Exception as e:
+            print(f"> Error - {e}", file=sys.stderr)
+            return 1
+        if writer:
+            if headers:
+                writer.writerow(headers)
+            writer.writerows(rows)
+            continue
+        for row in rows:
+            sys.stdout.write(
+                json.dumps(dict(zip(headers, row)), default=FramedJSON.encode_value)
+                + "\n"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
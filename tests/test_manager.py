@@ -1,8 +1,39 @@
+import io
+import os
+import csv
+import json
+import sys
+import time
+import array
+import signal
 import unittest
+import tempfile
+import contextlib
+import subprocess
+import threading
 import typing as t
 from os import remove
 from pathlib import Path
-from manager import Sqlite3Manager
+import manager_client
+from click.testing import CliRunner
+from manager import (
+    Sqlite3Manager,
+    QueryServer,
+    QueryClient,
+    FramedJSON,
+    QueryWatcher,
+    FanOut,
+    FunctionRegistry,
+    QueryInterrupted,
+    Sampler,
+    FullTextIndex,
+    Commands,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestSqlite3(unittest.TestCase):
@@ -22,6 +53,12 @@ class TestSqlite3(unittest.TestCase):
         self.db_path = Path("test.db")
         self.sqlite3_manager = Sqlite3Manager(self.db_path, auto_commit=True)
 
+    def temporary_dir(self) -> Path:
+        """Directory removed once the test is over"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return Path(directory.name)
+
     def test_execute_sql_statements(self):
         success, feedback = self.sqlite3_manager.execute_sql_command(
             self.create_table_sql_statement
@@ -41,6 +78,427 @@ class TestSqlite3(unittest.TestCase):
         self.assertTrue(success)
         self.assertIsInstance(feedback, t.Iterable)
 
+    def test_query_server(self):
+        socket_path = self.temporary_dir() / "manager.sock"
+        servers = []
+        ready = threading.Event()
+
+        def serve():
+            # sqlite3 connections are bound to the thread that created them
+            servers.append(
+                QueryServer(
+                    socket_path,
+                    Sqlite3Manager(self.db_path, auto_commit=True),
+                    idle_timeout=0.2,
+                )
+            )
+            ready.set()
+            servers[0].serve_forever()
+
+        threading.Thread(target=serve, daemon=True).start()
+        ready.wait()
+        try:
+            # Held up only until the server drops the idle client
+            idle_client = QueryClient(socket_path)
+            client = QueryClient(socket_path, self.db_path)
+            success, _ = client.execute_sql_command(self.create_table_sql_statement)
+            self.assertTrue(success)
+            self.assertIn("Linux", client.tables(tbl_names_only=True))
+            success, feedback = client.execute_sql_command("SELECT * FROM Unknown")
+            self.assertFalse(success)
+            self.assertIsInstance(feedback, Exception)
+            client.execute_sql_command("SELECT id, distro FROM Linux")
+            self.assertEqual(
+                [column[0] for column in client.last_description], ["id", "distro"]
+            )
+            # Malformed requests are answered instead of dropping the client
+            self.assertFalse(client.request("execute")["success"])
+            client.connection.sendall(FramedJSON.header.pack(3) + b"{x}")
+            self.assertFalse(FramedJSON.receive(client.connection)["success"])
+            self.assertTrue(client.request("ping")["success"])
+            client.__exit__()
+            time.sleep(0.3)
+            success, feedback = idle_client.execute_sql_command("SELECT 1")
+            self.assertEqual(feedback, [(1,)])
+            idle_client.__exit__()
+            self.assertEqual(
+                manager_client.query(
+                    self.db_path, "SELECT count(*) FROM Linux", socket_path
+                ),
+                (["count(*)"], [[0]]),
+            )
+        finally:
+            servers[0].shutdown()
+            servers[0].server_close()
+        self.assertFalse(socket_path.exists())
+
+    def test_client_imports(self):
+        # Checked in a fresh interpreter as this one has imported manager already
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import sys, manager_client; print(' '.join(sys.modules))",
+            ],
+            text=True,
+        )
+        for module in ("rich", "click", "prompt_toolkit", "colorama"):
+            self.assertNotIn(module, output.split())
+
+    def test_without_unix_sockets(self):
+        # As on Windows, where socketserver has no UnixStreamServer
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import socket; del socket.AF_UNIX; import manager; "
+                "print(list(manager.Commands.build_commands().commands))",
+            ],
+            text=True,
+        )
+        self.assertIn("execute", output)
+        self.assertNotIn("serve", output)
+
+    def test_query_watcher(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        watcher = QueryWatcher(
+            Sqlite3Manager(self.db_path, auto_commit=True),
+            "SELECT id, distro FROM Linux",
+            interval=0.01,
+            min_refresh=0,
+            key=0,
+        )
+        changes = iter(watcher)
+        self.assertEqual(next(changes)["added"], [])
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro) VALUES ('Kali')"
+        )
+        self.assertEqual(next(changes)["added"], [(1, "Kali")])
+        self.sqlite3_manager.execute_sql_command(
+            "UPDATE Linux SET distro='Parrot' WHERE id=1"
+        )
+        self.assertEqual(next(changes)["changed"], [(1, "Parrot")])
+        watcher.db_manager.__exit__()
+        # Whole rows are compared by default, so repeated values are counted
+        changes = QueryWatcher.diff([("new",), ("new",)], [("new",)] * 3)
+        self.assertEqual(changes["added"], [("new",)])
+        self.assertEqual(changes["removed"], [])
+
+    def test_blob_streaming(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro) VALUES ('Kali')"
+        )
+        logo = bytes(range(256)) * 1000
+        written = self.sqlite3_manager.write_blob(
+            "Linux", "logo", 1, io.BytesIO(logo), len(logo), chunk_size=1000
+        )
+        self.assertEqual(written, len(logo))
+        destination = io.BytesIO()
+        self.sqlite3_manager.read_blob("Linux", "logo", 1, destination, chunk_size=1000)
+        self.assertEqual(destination.getvalue(), logo)
+        self.assertEqual(
+            Commands.format_blob(logo, 2), f"<BLOB {len(logo)} bytes 0001...>"
+        )
+        with self.assertRaises(Exception):
+            self.sqlite3_manager.write_blob("Linux", "logo", 2, io.BytesIO(logo), 1)
+
+    def test_fan_out(self):
+        databases = []
+        directory = self.temporary_dir()
+        for index in range(3):
+            db_path = directory / f"tenant{index}.db"
+            db_manager = Sqlite3Manager(db_path, auto_commit=True)
+            db_manager.execute_sql_command(self.create_table_sql_statement)
+            for distro in ["Kali", "Parrot", "Ubuntu"][: index + 1]:
+                db_manager.execute_sql_command(
+                    f"INSERT INTO Linux (distro) VALUES ('{distro}')"
+                )
+            db_manager.__exit__()
+            databases.append(db_path)
+        results = list(FanOut(databases, "SELECT count(*), max(id) FROM Linux", jobs=2))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(success for _, success, _, _ in results))
+        rows = [row for *_, entries in results for row in entries]
+        self.assertEqual(FanOut.aggregate(rows, "sum"), [6, 6])
+        self.assertEqual(FanOut.aggregate(rows, "max"), [3, 3])
+        self.assertEqual(FanOut.aggregate(rows, "count"), [3, 3])
+        _, success, _, _ = next(iter(FanOut(databases[:1], "SELECT * FROM Unknown")))
+        self.assertFalse(success)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            Commands.stdout_fan_out(
+                FanOut(databases, "SELECT id, id FROM Linux WHERE id = 1"), json=True
+            )
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(
+            sorted(line["database"] for line in lines), sorted(map(str, databases))
+        )
+        self.assertEqual(lines[0]["id_1"], 1)
+
+    def test_export(self):
+        directory = self.temporary_dir()
+        for name, columns in (("a", ["id", "logo", "org"]), ("b", ["id", "logo"])):
+            db_manager = Sqlite3Manager(directory / f"{name}.db", auto_commit=True)
+            db_manager.execute_sql_command(f"CREATE TABLE Linux ({', '.join(columns)})")
+            db_manager.execute_sql_command(
+                f"INSERT INTO Linux VALUES ({', '.join('?' * len(columns))})",
+                parameters=[1, b"\x00\xff", "Debian"][: len(columns)],
+            )
+            db_manager.__exit__()
+        output = directory / "linux.csv"
+        result = CliRunner().invoke(
+            Commands.export,
+            [str(directory / "a.db"), str(directory / "b.db")]
+            + ["-s", "SELECT * FROM Linux", "-o", str(output)],
+        )
+        # Whichever database finishes first sets the columns, the other is skipped
+        self.assertIn("Skipped", result.output)
+        header, row = csv.reader(output.read_text().splitlines())
+        self.assertEqual(header[:3], ["database", "id", "logo"])
+        self.assertEqual(len(row), len(header))
+        self.assertEqual(row[2], "00ff")
+
+    def test_builtin_functions(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro) VALUES ('Kali'), ('Parrot'), ('Ubuntu')"
+        )
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            "SELECT distro FROM Linux WHERE distro REGEXP '^[KP]' ORDER BY id"
+        )
+        self.assertTrue(success)
+        self.assertEqual(feedback, [("Kali",), ("Parrot",)])
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            "CREATE INDEX distro_hash ON Linux (sha256(distro))"
+        )
+        self.assertTrue(success)
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            'SELECT json_canonical(\'{"b": 1, "a": [1, 2]}\')'
+        )
+        self.assertEqual(feedback, [('{"a":[1,2],"b":1}',)])
+
+    def test_function_plugin(self):
+        plugin_path = self.temporary_dir() / "plugin.py"
+        plugin_path.write_text(
+            "import itertools\n"
+            "ticks = itertools.count()\n"
+            "class Longest:\n"
+            "    def __init__(self):\n"
+            "        self.value = None\n"
+            "    def step(self, value):\n"
+            "        if self.value is None or len(value) > len(self.value):\n"
+            "            self.value = value\n"
+            "    def finalize(self):\n"
+            "        return self.value\n"
+            "def register(registry):\n"
+            "    registry.scalar('reverse', 1)(lambda text: text[::-1])\n"
+            "    registry.aggregate('longest', 1)(Longest)\n"
+            "    registry.scalar('tick', 0)(lambda: next(ticks))\n"
+        )
+        db_manager = Sqlite3Manager(":memory:", plugins=[str(plugin_path)])
+        success, feedback = db_manager.execute_sql_command(
+            "SELECT reverse('Kali'), longest(value) FROM (SELECT 'Arch' AS value "
+            "UNION ALL SELECT 'Ubuntu')"
+        )
+        self.assertTrue(success)
+        self.assertEqual(feedback, [("ilaK", "Ubuntu")])
+        # Scalars aren't deterministic unless said so, hence run for every row
+        success, feedback = db_manager.execute_sql_command(
+            "SELECT tick() FROM (SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3)"
+        )
+        self.assertEqual(len(set(feedback)), 3)
+        with self.assertRaises(Exception):
+            FunctionRegistry().load_plugin("json")
+        db_manager.__exit__()
+
+    def test_statement_limits(self):
+        endless_query = (
+            "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter)"
+            " SELECT count(*) FROM counter"
+        )
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            endless_query, timeout=0.1
+        )
+        self.assertFalse(success)
+        self.assertIsInstance(feedback, QueryInterrupted)
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            endless_query, max_steps=10000
+        )
+        self.assertIsInstance(feedback, QueryInterrupted)
+        success, feedback = self.sqlite3_manager.execute_sql_command(
+            "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter)"
+            " SELECT x FROM counter",
+            max_rows=5,
+        )
+        self.assertTrue(success)
+        self.assertEqual(len(feedback), 5)
+        timer = threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        success, feedback = self.sqlite3_manager.execute_sql_command(endless_query)
+        timer.join()
+        self.assertIsInstance(feedback, QueryInterrupted)
+        success, feedback = self.sqlite3_manager.execute_sql_command("SELECT 1")
+        self.assertEqual(feedback, [(1,)])
+        # Limits of streamed queries add up over fetches
+        with self.assertRaises(QueryInterrupted):
+            for _ in self.sqlite3_manager.iter_rows(
+                endless_query.replace("count(*)", "x"), chunk_size=100, max_steps=50000
+            ):
+                pass
+
+    def test_streamed_query_guard(self):
+        rows = self.sqlite3_manager.iter_rows(
+            "WITH RECURSIVE counter(x) AS "
+            "(SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < 30)"
+            " SELECT x FROM counter",
+            chunk_size=10,
+            timeout=0.2,
+        )
+        sigint_handler = signal.getsignal(signal.SIGINT)
+        next(rows)
+        # Guard is lifted while the consumer holds a chunk
+        self.assertIs(signal.getsignal(signal.SIGINT), sigint_handler)
+        success, feedback = self.sqlite3_manager.execute_sql_command("SELECT 1")
+        self.assertEqual(feedback, [(1,)])
+        time.sleep(0.3)
+        self.assertEqual(len(list(rows)), 2)
+
+    def test_sampler(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        for index in range(50):
+            self.sqlite3_manager.execute_sql_command(
+                "INSERT INTO Linux (distro, is_maintained) VALUES (?, ?)",
+                parameters=(f"distro{index}", index % 2),
+            )
+        sampler = Sampler(
+            self.sqlite3_manager, "Linux", ["id"], where="id > 10", batch_size=7
+        )
+        refinements = list(sampler.refine(sample_size=1000, time_budget=0))
+        self.assertEqual(len(refinements), 8)
+        self.assertTrue(sampler.exhausted)
+        estimates = dict(zip(Sampler.headers, sampler.estimates()[0]))
+        # Whole table sampled so estimates are exact
+        self.assertEqual(estimates["count"], 40)
+        self.assertEqual(estimates["count_margin"], 0)
+        self.assertEqual(estimates["avg"], 30.5)
+        self.assertEqual(estimates["sum"], 1220)
+        sampler = Sampler(self.sqlite3_manager, "Linux", group_by="is_maintained")
+        next(sampler.refine(sample_size=20))
+        self.assertTrue(set(group for group, *_ in sampler.estimates()) <= {0, 1})
+
+    def test_full_text_index(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro, org) VALUES ('Kali', 'Offensive Security'), "
+            "('Fedora', 'Red Hat')"
+        )
+        index = FullTextIndex(self.sqlite3_manager, "Linux")
+        index.create(["distro", "org"])
+        self.assertEqual(
+            FullTextIndex.indexes(self.sqlite3_manager), [("Linux_fts", "Linux")]
+        )
+        headers, rows = index.search("security")
+        self.assertEqual(headers[:3], ["rank", "id", "distro"])
+        self.assertEqual([row[2] for row in rows], ["Kali"])
+        self.sqlite3_manager.execute_sql_command(
+            "UPDATE Linux SET org = 'Community' WHERE distro = 'Kali'"
+        )
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro, org) VALUES ('Parrot', 'Security team')"
+        )
+        _, rows = index.search("security")
+        self.assertEqual([row[2] for row in rows], ["Parrot"])
+        self.sqlite3_manager.execute_sql_command(
+            "UPDATE Linux SET id = 5 WHERE distro = 'Fedora'"
+        )
+        _, rows = index.search("fedora")
+        self.assertEqual([row[1] for row in rows], [5])
+        index.rebuild(optimize=True)
+        index.drop()
+        self.assertEqual(FullTextIndex.indexes(self.sqlite3_manager), [])
+
+    def test_fetch_columns(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        for index in range(25):
+            self.sqlite3_manager.execute_sql_command(
+                "INSERT INTO Linux (distro, logo) VALUES (?, ?)",
+                parameters=(f"distro{index}", b"logo" if index % 2 else None),
+            )
+        columns = self.sqlite3_manager.fetch_columns(
+            "SELECT id, distro, logo, id / 2.0 AS half FROM Linux",
+            chunk_size=10,
+            use_numpy=False,
+        )
+        self.assertEqual(list(columns), ["id", "distro", "logo", "half"])
+        self.assertEqual(columns["id"], array.array("q", range(1, 26)))
+        self.assertEqual(columns["half"].typecode, "d")
+        self.assertEqual(columns["distro"][0], "distro0")
+        self.assertEqual(columns["logo"][:2], [None, b"logo"])
+        chunks = list(
+            self.sqlite3_manager.iter_columns(
+                "SELECT id FROM Linux", chunk_size=10, use_numpy=False
+            )
+        )
+        self.assertEqual([len(chunk["id"]) for chunk in chunks], [10, 10, 5])
+
+    def test_fetch_aliased_columns(self):
+        self.sqlite3_manager.execute_sql_command(
+            "CREATE TABLE Sample (a INTEGER, b REAL)"
+        )
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Sample VALUES (9223372036854775807, 1.5)"
+        )
+        # Declared types are looked up by name, here those of the other column
+        columns = self.sqlite3_manager.fetch_columns(
+            "SELECT a AS b, b AS a FROM Sample", use_numpy=False
+        )
+        self.assertEqual(list(columns["b"]), [9223372036854775807])
+        self.assertEqual(list(columns["a"]), [1.5])
+
+    @unittest.skipUnless(numpy, "numpy isn't installed")
+    def test_fetch_numpy_columns(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        for index in range(3):
+            self.sqlite3_manager.execute_sql_command(
+                "INSERT INTO Linux (distro, logo) VALUES (?, ?)",
+                parameters=(f"distro{index}", b"logo" if index % 2 else None),
+            )
+        columns = self.sqlite3_manager.fetch_columns(
+            "SELECT id, id / 2.0 AS half, distro, logo FROM Linux",
+            chunk_size=2,
+            use_numpy=True,
+        )
+        self.assertEqual(columns["id"].dtype, numpy.int64)
+        self.assertEqual(columns["id"].tolist(), [1, 2, 3])
+        self.assertEqual(columns["half"].dtype, numpy.float64)
+        self.assertEqual(columns["distro"].dtype, object)
+        self.assertEqual(columns["logo"].tolist(), [None, b"logo", None])
+
+    def test_fetch_joined_columns(self):
+        self.sqlite3_manager.execute_sql_command(self.create_table_sql_statement)
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Linux (distro) VALUES ('Kali'), ('Parrot')"
+        )
+        self.sqlite3_manager.execute_sql_command(
+            "CREATE TABLE Release (id INTEGER PRIMARY KEY, linux_id INTEGER)"
+        )
+        self.sqlite3_manager.execute_sql_command(
+            "INSERT INTO Release (id, linux_id) VALUES (10, 1), (11, 2)"
+        )
+        statement = (
+            "SELECT Linux.id, Release.id, distro FROM Linux "
+            "JOIN Release ON Release.linux_id = Linux.id ORDER BY Linux.id"
+        )
+        columns = self.sqlite3_manager.fetch_columns(statement, use_numpy=False)
+        self.assertEqual(list(columns), ["id", "id_1", "distro"])
+        self.assertEqual(list(columns["id_1"]), [10, 11])
+        # Exported rows keep every column, repeated names included
+        ((_, success, headers, rows),) = FanOut([self.db_path], statement)
+        self.assertTrue(success)
+        self.assertEqual(headers, ["id", "id", "distro"])
+        self.assertEqual(rows, [(1, 10, "Kali"), (2, 11, "Parrot")])
+
     def tearDown(self):
         if self.db_path.exists():
             remove(self.db_path)